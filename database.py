@@ -1,16 +1,92 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import MongoClient
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import AsyncMongoClient, WriteConcern
 from dotenv import load_dotenv
+from models import Student
 import os
 
 load_dotenv()
 
+MONGODB_URI = os.getenv("MONGODB_URI")
+DATABASE_NAME = os.getenv("DATABASE_NAME")
+
+# Connection budget for the whole deployment, split evenly across worker processes
+# so that adding workers doesn't multiply the connections opened against MongoDB
+def _worker_count():
+    # An unset, zero or malformed WEB_CONCURRENCY means a single process
+    try:
+        return max(1, int(os.getenv("WEB_CONCURRENCY") or 1))
+    except ValueError:
+        return 1
+
+WEB_CONCURRENCY = _worker_count()
+MONGODB_MAX_POOL_SIZE = max(1, int(os.getenv("MONGODB_MAX_POOL_SIZE", 200)) // WEB_CONCURRENCY)
+MONGODB_MIN_POOL_SIZE = min(
+    MONGODB_MAX_POOL_SIZE,
+    int(os.getenv("MONGODB_MIN_POOL_SIZE", 20)) // WEB_CONCURRENCY
+)
+
+# Shared async client, created on first use so that every worker process
+# opens its own connection pool after it has been forked.
+_client = None
+_db = None
+_student_inserts = None
+_raw_students = None
+
+def get_async_client():
+    global _client, _db, _student_inserts, _raw_students
+    
+    if _client is None:
+        # zstd compression is negotiated with the server, falling back to zlib
+        _client = AsyncMongoClient(
+            MONGODB_URI,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE,
+            minPoolSize=MONGODB_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=2000,
+            compressors="zstd,zlib"
+        )
+        _db = _client[DATABASE_NAME]
+        
+        # Student inserts are validated by the app, so they only wait for the primary's acknowledgement
+        _student_inserts = _db.get_collection("students", write_concern=WriteConcern(w=1, j=False))
+        
+        # Reads through this handle return undecoded BSON
+        _raw_students = _db.get_collection(
+            "students",
+            codec_options=CodecOptions(document_class=RawBSONDocument)
+        )
+    
+    return _client
+
 # Async database connection for FastAPI
-async def get_async_database():
-    client = AsyncIOMotorClient(os.getenv("MONGODB_URI"))
-    return client[os.getenv("DATABASE_NAME")]
-
-# Sync database connection for potential utility functions
-def get_sync_database():
-    client = MongoClient(os.getenv("MONGODB_URI"))
-    return client[os.getenv("DATABASE_NAME")]
+def get_async_database():
+    get_async_client()
+    return _db
+
+# Collection handle used when inserting new students
+def get_async_student_inserts():
+    get_async_client()
+    return _student_inserts
+
+# Collection handle returning RawBSONDocument for pass-through reads
+def get_async_raw_students():
+    get_async_client()
+    return _raw_students
+
+# Open the first pooled connection before any request needs it
+async def ping_async_database():
+    await get_async_client().admin.command("ping")
+
+# Close this process's connection pool on shutdown
+async def close_async_database():
+    global _client, _db, _student_inserts, _raw_students
+    
+    if _client is not None:
+        await _client.close()
+        _client = _db = _student_inserts = _raw_students = None
+
+# Create the indexes declared on the Student model
+async def create_async_indexes():
+    db = get_async_database()
+    for keys in Student.__indexes__:
+        await db.students.create_index(keys)
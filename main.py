@@ -1,5 +1,15 @@
+import os
 import uvicorn
-from routes import app
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # One worker per core by default; each worker runs its own event loop and Mongo pool.
+    # Workers inherit WEB_CONCURRENCY and use it to size their share of the pool.
+    os.environ.setdefault("WEB_CONCURRENCY", str(os.cpu_count() or 1))
+    uvicorn.run(
+        "routes:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.environ["WEB_CONCURRENCY"])
+    )
@@ -1,49 +1,30 @@
-from typing import Dict, Optional, Any
-from bson import ObjectId
+from typing import ClassVar, List
+import msgspec
 
-class Address:
-    def __init__(self, city: str, country: str):
-        if not city or not country:
+class Address(msgspec.Struct):
+    city: str
+    country: str
+
+    def __post_init__(self):
+        if not self.city or not self.country:
             raise ValueError("City and country are required")
-        self.city = city
-        self.country = country
 
-    def to_dict(self):
-        return {
-            "city": self.city,
-            "country": self.country
-        }
+class Student(msgspec.Struct):
+    # Indexes backing the country/age filters of the student listing; the trailing _id
+    # lets them return matches already in the listing's (age, _id) sort order
+    __indexes__: ClassVar[List] = [
+        [("address.country", 1), ("age", 1), ("_id", 1)],
+        [("age", 1), ("_id", 1)]
+    ]
+
+    name: str
+    age: int
+    address: Address
 
-class Student:
-    def __init__(self, name: str, age: int, address: Dict[str, str]):
-        # Validation
-        if not name or not isinstance(name, str):
+    def __post_init__(self):
+        # Validation (types are already enforced by msgspec)
+        if not self.name:
             raise ValueError("Name must be a non-empty string")
         
-        if not isinstance(age, int) or age < 0:
+        if self.age < 0:
             raise ValueError("Age must be a non-negative integer")
-        
-        if not isinstance(address, dict):
-            raise ValueError("Address must be a dictionary")
-        
-        self.name = name
-        self.age = age
-        self.address = Address(
-            city=address.get('city'), 
-            country=address.get('country')
-        )
-
-    def to_dict(self):
-        return {
-            "name": self.name,
-            "age": self.age,
-            "address": self.address.to_dict()
-        }
-
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]):
-        return cls(
-            name=data['name'],
-            age=data['age'],
-            address=data['address']
-        )
\ No newline at end of file
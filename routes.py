@@ -1,16 +1,50 @@
-from fastapi import FastAPI, HTTPException, Query, Path, Body, Response
+from fastapi import FastAPI, HTTPException, Query, Path, Body, Response, Depends, Request
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional, Dict, Any
-from database import get_async_database
+from database import (
+    get_async_database,
+    get_async_student_inserts,
+    get_async_raw_students,
+    ping_async_database,
+    close_async_database,
+    create_async_indexes
+)
 from models import Student
 from bson import ObjectId
+import bson
+from bson.errors import InvalidId
+from bson.int64 import Int64
+from cachetools import TTLCache
+from functools import lru_cache
+from pymongo.errors import PyMongoError, WaitQueueTimeoutError
+import logging
+import msgspec
+import os
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Student Management System",
     description="API for managing student records",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    # Set OPENAPI_URL to an empty string to skip schema generation and the docs pages
+    openapi_url=os.getenv("OPENAPI_URL", "/openapi.json") or None
 )
 
-@app.post("/students", status_code=201, responses={
+# OpenAPI documentation, built once and shared by the route decorators
+STUDENT_NOT_FOUND_RESPONSE = {
+    "description": "Student not found",
+    "content": {
+        "application/json": {
+            "example": {
+                "detail": "Student not found"
+            }
+        }
+    }
+}
+
+CREATE_STUDENT_RESPONSES = {
     201: {
         "description": "A JSON response sending back the ID of the newly created student record.",
         "content": {
@@ -21,37 +55,28 @@ app = FastAPI(
             }
         }
     }
-})
-async def create_student(
-    student_data: Dict[str, Any] = Body(
-        example={
-            "name": "string",
-            "age": 0,
-            "address": {
-                "city": "string",
-                "country": "string"
+}
+
+CREATE_STUDENT_OPENAPI_EXTRA = {
+    # The body is read raw, so document it here for the OpenAPI schema
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "example": {
+                    "name": "string",
+                    "age": 0,
+                    "address": {
+                        "city": "string",
+                        "country": "string"
+                    }
+                }
             }
         }
-    )
-):
-    """
-    API to create a student in the system. All fields are mandatory and required while creating the student in the system.
-    """
-    try:
-        student = Student(
-            name=student_data['name'], 
-            age=student_data['age'], 
-            address=student_data['address']
-        )
-        
-        db = await get_async_database()
-        result = await db.students.insert_one(student.to_dict())
-        return {"id": str(result.inserted_id)}
-    
-    except (KeyError, ValueError) as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    }
+}
 
-@app.get("/students", responses={
+LIST_STUDENTS_RESPONSES = {
     200: {
         "description": "A list of students matching the query filters.",
         "content": {
@@ -65,41 +90,9 @@ async def create_student(
             }
         }
     }
-})
-async def list_students(
-    country: Optional[str] = Query(
-        None, 
-        description="To apply filter of country. If not given or empty, this filter should be applied.",
-    ),
-    age: Optional[int] = Query(
-        None, 
-        description="Only records which have age greater than or equal to the provided age should be present in the result. If not given or empty, this filter should be applied.",
-    )
-):
-    """
-    An API to find a list of students. You can apply filters on this API by passing the query parameters as listed below.
-    """
-    db = await get_async_database()
-    query = {}
-    
-    if country:
-        query["address.country"] = country
-    if age is not None:
-        query["age"] = {"$gte": age}
-    
-    cursor = db.students.find(query)
-    students = await cursor.to_list(length=1000)
-    
-    return {
-        "data": [
-            {
-                "name": student["name"],
-                "age": student["age"]
-            } for student in students
-        ]
-    }
+}
 
-@app.get("/students/{id}", responses={
+FETCH_STUDENT_RESPONSES = {
     200: {
         "description": "A student record returned by ID.",
         "content": {
@@ -112,40 +105,16 @@ async def list_students(
                         "country": "string"
                     }
                 }
+            },
+            "application/bson": {
+                "schema": {"type": "string", "format": "binary"}
             }
         }
     },
-    404: {
-        "description": "Student not found",
-        "content": {
-            "application/json": {
-                "example": {
-                    "detail": "Student not found"
-                }
-            }
-        }
-    }
-})
-async def fetch_student(
-    id: str = Path(
-        ..., 
-        description="The ID of the student previously created.",
-    )
-):
-    """
-    Fetch a specific student by their ID
-    """
-    db = await get_async_database()
-    student = await db.students.find_one({"_id": ObjectId(id)})
-    
-    if not student:
-        raise HTTPException(status_code=404, detail="Student not found")
-    
-    student["id"] = str(student["_id"])
-    del student["_id"]
-    return student
+    404: STUDENT_NOT_FOUND_RESPONSE
+}
 
-@app.patch("/students/{id}", status_code=204, responses={
+UPDATE_STUDENT_RESPONSES = {
     204: {
         "description": "No content. The student record was successfully updated.",
         "content": {
@@ -154,22 +123,243 @@ async def fetch_student(
             }
         }
     },
-    404: {
-        "description": "Student not found",
+    404: STUDENT_NOT_FOUND_RESPONSE
+}
+
+DELETE_STUDENT_RESPONSES = {
+    200: {
+        "description": "Student record successfully deleted.",
         "content": {
             "application/json": {
-                "example": {
-                    "detail": "Student not found"
-                }
+                "example": {}
             }
         }
-    }
-})
-async def update_student(
+    },
+    404: STUDENT_NOT_FOUND_RESPONSE
+}
+
+def _encode_bson_types(obj: Any) -> Any:
+    # PyMongo decodes NumberLong values as Int64 and ids as ObjectId, neither of which msgspec knows
+    if isinstance(obj, Int64):
+        return int(obj)
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise NotImplementedError(f"Encoding objects of type {type(obj).__name__} is unsupported")
+
+_json_encoder = msgspec.json.Encoder(enc_hook=_encode_bson_types)
+
+# Encoded list_students responses keyed by filters and page; cleared on every write.
+# The cache is per process: with several workers a write only clears the cache of the
+# worker that handled it, so other workers may serve a list without it for up to the TTL.
+_list_cache = TTLCache(maxsize=1024, ttl=5)
+
+# Bumped on every write so a read that started before the write doesn't cache its stale result
+_list_cache_generation = 0
+
+def invalidate_list_cache():
+    global _list_cache_generation
+    _list_cache_generation += 1
+    _list_cache.clear()
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    # Encode with msgspec and bypass FastAPI's jsonable_encoder
+    return Response(
+        content=_json_encoder.encode(content),
+        status_code=status_code,
+        media_type="application/json"
+    )
+
+# Fields accepted by update_student
+ALLOWED_TOP_LEVEL_FIELDS = frozenset({'name', 'age', 'address'})
+ALLOWED_ADDRESS_FIELDS = frozenset({'city', 'country'})
+ALLOWED_TOP_LEVEL_FIELDS_TEXT = ", ".join(sorted(ALLOWED_TOP_LEVEL_FIELDS))
+ALLOWED_ADDRESS_FIELDS_TEXT = ", ".join(sorted(ALLOWED_ADDRESS_FIELDS))
+
+def build_student_query(country: Optional[str], age: Optional[int]) -> Dict[str, Any]:
+    # Each filter combination is built in one literal instead of mutating a dict
+    if country and age is not None:
+        return {"address.country": country, "age": {"$gte": age}}
+    if country:
+        return {"address.country": country}
+    if age is not None:
+        return {"age": {"$gte": age}}
+    return {}
+
+def accepts_bson(accept: str) -> bool:
+    # BSON is only served when it is explicitly accepted (q > 0) and ranked at least as high
+    # as JSON; on a tie, an explicit application/json entry keeps the JSON default
+    bson_q = 0.0
+    json_q = None
+    wildcard_q = 0.0
+    for media_range in accept.split(","):
+        media_type, *params = media_range.split(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type == "application/bson":
+            bson_q = max(bson_q, q)
+        elif media_type == "application/json":
+            json_q = max(json_q or 0.0, q)
+        elif media_type in ("application/*", "*/*"):
+            wildcard_q = max(wildcard_q, q)
+    
+    if json_q is not None:
+        return bson_q > json_q
+    return bson_q > 0 and bson_q >= wildcard_q
+
+# Repeated IDs (detail views, retries) skip re-parsing; invalid IDs raise and are never cached
+@lru_cache(maxsize=4096)
+def _oid(id: str) -> ObjectId:
+    return ObjectId(id)
+
+async def parse_oid(
     id: str = Path(
         ..., 
         description="The ID of the student previously created.",
+    )
+) -> ObjectId:
+    # Reject malformed IDs with a 400 before touching the database
+    try:
+        return _oid(id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid student ID")
+
+@app.on_event("startup")
+async def warm_up_database():
+    await ping_async_database()
+    
+    # Index creation is idempotent, but a conflicting existing index should not stop the app
+    try:
+        await create_async_indexes()
+    except PyMongoError as e:
+        logger.warning("Could not create student indexes: %s", e)
+
+# Each worker only gets its share of the pool, so a burst can exhaust it; report that as
+# a retryable 503 rather than an unhandled 500
+@app.exception_handler(WaitQueueTimeoutError)
+async def database_busy(request: Request, exc: WaitQueueTimeoutError):
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Database is busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.on_event("shutdown")
+async def close_database():
+    await close_async_database()
+
+@app.post("/students", status_code=201, responses=CREATE_STUDENT_RESPONSES, openapi_extra=CREATE_STUDENT_OPENAPI_EXTRA)
+async def create_student(request: Request):
+    """
+    API to create a student in the system. All fields are mandatory and required while creating the student in the system.
+    """
+    # Decode and validate the body in a single msgspec pass
+    try:
+        student = msgspec.json.decode(await request.body(), type=Student)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    students = get_async_student_inserts()
+    result = await students.insert_one(msgspec.to_builtins(student))
+    invalidate_list_cache()
+    return json_response({"id": str(result.inserted_id)}, status_code=201)
+
+@app.get("/students", responses=LIST_STUDENTS_RESPONSES)
+async def list_students(
+    country: Optional[str] = Query(
+        None, 
+        description="To apply filter of country. If not given or empty, this filter should be applied.",
     ),
+    age: Optional[int] = Query(
+        None, 
+        description="Only records which have age greater than or equal to the provided age should be present in the result. If not given or empty, this filter should be applied.",
+    ),
+    skip: int = Query(
+        0,
+        ge=0,
+        le=2**31 - 1,
+        description="Number of matching records to skip before the returned page.",
+    ),
+    limit: int = Query(
+        50,
+        ge=1,
+        le=500,
+        description="Maximum number of records to return.",
+    )
+):
+    """
+    An API to find a list of students. You can apply filters on this API by passing the query parameters as listed below.
+    
+    - Results are cached for up to 5 seconds, so a student created, updated or deleted just before may not be reflected yet
+    """
+    cache_key = (country or None, age, skip, limit)
+    body = _list_cache.get(cache_key)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+    
+    generation = _list_cache_generation
+    db = get_async_database()
+    query = build_student_query(country, age)
+    
+    # Only fetch the fields included in the response, consuming batches as they arrive.
+    # Sorting by (age, _id) keeps pages stable and is served by the student indexes.
+    cursor = (
+        db.students.find(query, {"name": 1, "age": 1, "_id": 0})
+        .sort([("age", 1), ("_id", 1)])
+        .skip(skip)
+        .limit(limit)
+        .batch_size(500)
+    )
+    students = []
+    async for student in cursor:
+        students.append(student)
+    
+    body = _json_encoder.encode({"data": students})
+    if generation == _list_cache_generation:
+        _list_cache[cache_key] = body
+    return Response(content=body, media_type="application/json")
+
+@app.get("/students/{id}", responses=FETCH_STUDENT_RESPONSES)
+async def fetch_student(
+    request: Request,
+    oid: ObjectId = Depends(parse_oid)
+):
+    """
+    Fetch a specific student by their ID
+    
+    - Clients sending `Accept: application/bson` receive the stored BSON document as-is, without `_id`
+    """
+    # The ID is already known from the path, so leave _id out of the read
+    students = get_async_raw_students()
+    raw_student = await students.find_one({"_id": oid}, projection={"_id": 0})
+    
+    if raw_student is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    
+    # Pass the document through without decoding it into Python objects
+    # The representation depends on Accept, so tell shared caches to key on it
+    if accepts_bson(request.headers.get("accept", "")):
+        return Response(
+            content=raw_student.raw,
+            media_type="application/bson",
+            headers={"Vary": "Accept"}
+        )
+    
+    student = bson.decode(raw_student.raw)
+    student["id"] = str(oid)
+    response = json_response(student)
+    response.headers["Vary"] = "Accept"
+    return response
+
+@app.patch("/students/{id}", status_code=204, responses=UPDATE_STUDENT_RESPONSES)
+async def update_student(
+    oid: ObjectId = Depends(parse_oid),
     student_update: Dict[str, Any] = Body(
         example={
             "name": "string",
@@ -187,18 +377,14 @@ async def update_student(
     - Partial updates are supported
     - Only provided fields will be updated
     """
-    db = await get_async_database()
-    
-    # Define allowed fields
-    ALLOWED_TOP_LEVEL_FIELDS = {'name', 'age', 'address'}
-    ALLOWED_ADDRESS_FIELDS = {'city', 'country'}
+    db = get_async_database()
     
     # Validate input fields
     for key in student_update:
         if key not in ALLOWED_TOP_LEVEL_FIELDS:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Invalid field: {key}. Allowed fields are: {', '.join(ALLOWED_TOP_LEVEL_FIELDS)}"
+                detail=f"Invalid field: {key}. Allowed fields are: {ALLOWED_TOP_LEVEL_FIELDS_TEXT}"
             )
     
     # Validate address fields if address is present
@@ -207,80 +393,49 @@ async def update_student(
             if key not in ALLOWED_ADDRESS_FIELDS:
                 raise HTTPException(
                     status_code=400, 
-                    detail=f"Invalid address field: {key}. Allowed fields are: {', '.join(ALLOWED_ADDRESS_FIELDS)}"
+                    detail=f"Invalid address field: {key}. Allowed fields are: {ALLOWED_ADDRESS_FIELDS_TEXT}"
                 )
     
-    # Fetch the current student document first
-    student = await db.students.find_one({"_id": ObjectId(id)})
-    
-    if not student:
-        raise HTTPException(status_code=404, detail="Student not found")
+    # Build a partial update; dotted address keys let the server merge the sub-document
+    set_doc = {}
     
-    # Prepare update data with only allowed fields
-    update_data = {}
-    
-    # Handle top-level fields
     if 'name' in student_update:
-        update_data['name'] = student_update['name']
+        set_doc['name'] = student_update['name']
     
     if 'age' in student_update:
-        update_data['age'] = student_update['age']
+        set_doc['age'] = student_update['age']
     
-    # Handle address updates
-    if 'address' in student_update:
-        update_data['address'] = student.get('address', {}).copy()
-        
-        if 'city' in student_update['address']:
-            update_data['address']['city'] = student_update['address']['city']
-        
-        if 'country' in student_update['address']:
-            update_data['address']['country'] = student_update['address']['country']
+    for key in student_update.get('address', {}):
+        set_doc[f"address.{key}"] = student_update['address'][key]
     
-    # Perform the update
-    result = await db.students.update_one(
-        {"_id": ObjectId(id)}, 
-        {"$set": update_data}
-    )
+    # An empty $set is rejected by the server, so only check that the student exists
+    if set_doc:
+        student = await db.students.find_one_and_update(
+            {"_id": oid},
+            {"$set": set_doc},
+            projection={"_id": 1}
+        )
+    else:
+        student = await db.students.find_one({"_id": oid}, {"_id": 1})
     
-    if result.modified_count == 0:
+    if student is None:
         raise HTTPException(status_code=404, detail="Student not found")
     
+    invalidate_list_cache()
     return Response(status_code=204)
 
-@app.delete("/students/{id}", status_code=200, responses={
-    200: {
-        "description": "Student record successfully deleted.",
-        "content": {
-            "application/json": {
-                "example": {}
-            }
-        }
-    },
-    404: {
-        "description": "Student not found",
-        "content": {
-            "application/json": {
-                "example": {
-                    "detail": "Student not found"
-                }
-            }
-        }
-    }
-})
+@app.delete("/students/{id}", status_code=200, responses=DELETE_STUDENT_RESPONSES)
 async def delete_student(
-    id: str = Path(
-        ..., 
-        description="The ID of the student previously created.",
-        example="string"
-    )
+    oid: ObjectId = Depends(parse_oid)
 ):
     """
     Delete a student record by their ID
     """
-    db = await get_async_database()
-    result = await db.students.delete_one({"_id": ObjectId(id)})
+    db = get_async_database()
+    result = await db.students.delete_one({"_id": oid})
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Student not found")
     
+    invalidate_list_cache()
     return {}